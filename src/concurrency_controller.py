@@ -0,0 +1,209 @@
+"""
+Adaptive Concurrency Controller
+AIMD-style limit on how many accounts are applied in parallel,
+driven by Meroshare step latencies and error rates
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+# Error messages that point at the network/portal rather than the account
+OVERLOAD_MARKERS = ("net::ERR_", "NS_ERROR_", "Navigation failed", "Navigation timeout")
+
+
+def is_overload_error(error: Optional[BaseException]) -> bool:
+    """True for timeouts and network/navigation errors - signs the portal is struggling
+
+    Business failures (IPO already applied or closed, wrong credentials, bank
+    not found) are deliberately not overload signals, even when Playwright
+    only noticed them by waiting for an element.
+    """
+    if error is None:
+        return False
+    # Playwright's TimeoutError does not subclass the builtin one
+    if isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ == "TimeoutError":
+        return True
+    return any(marker in str(error) for marker in OVERLOAD_MARKERS)
+
+
+class AdaptiveConcurrencyController:
+    """Grow or shrink the number of in-flight accounts based on portal health
+
+    Every step reports its latency and outcome. Once a window of samples is
+    collected the controller decides:
+      - decrease (multiplicative) straight away on any overload error, or once
+        steps are much slower than the fastest time seen for that step
+      - increase (additive) if the portal is healthy and the current limit is
+        actually being used
+      - hold otherwise
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 3,
+        min_concurrency: int = 1,
+        initial_concurrency: int = 1,
+        min_request_spacing: float = 2.0,
+        latency_tolerance: float = 1.5,
+        additive_increase: float = 1.0,
+        multiplicative_decrease: float = 0.5,
+        window_size: int = 6,
+        baseline_drift: float = 0.05
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.min_request_spacing = max(0.0, min_request_spacing)
+        self.latency_tolerance = latency_tolerance
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.window_size = max(1, window_size)
+        self.baseline_drift = baseline_drift
+
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+        self._window = deque()
+        self._baselines: Dict[str, float] = {}
+        self._decisions: List[Dict] = []
+        self._samples = 0
+        self._errors = 0
+        self._business_errors = 0
+        self._last_request = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        """Whole number of accounts allowed in flight right now"""
+        return max(self.min_concurrency, int(self.limit))
+
+    def acquire(self) -> None:
+        """Block until an account slot is free, then take it
+
+        Does not pace - the first portal request of the account does that.
+        """
+        with self._cond:
+            while self.in_flight >= self.current_limit:
+                self._cond.wait()
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self) -> None:
+        """Give back an account slot"""
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify_all()
+
+    def pace(self) -> None:
+        """Enforce the minimum spacing between requests sent to the portal"""
+        with self._cond:
+            now = time.monotonic()
+            wait = self._last_request + self.min_request_spacing - now
+            # Reserve our slot before sleeping so concurrent callers queue up behind us
+            self._last_request = max(now, self._last_request + self.min_request_spacing)
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_step(self, step: str, latency: float, success: bool = True, overload: bool = True) -> None:
+        """Report one step's latency (seconds) and outcome
+
+        A failed step only counts against the portal when overload is True
+        (see is_overload_error); other failures are counted but ignored by AIMD.
+        """
+        with self._cond:
+            self._samples += 1
+            if not success:
+                self._errors += 1
+                if not overload:
+                    # Says nothing about portal health and its latency is meaningless
+                    self._business_errors += 1
+                    return
+
+            baseline = self._baselines.get(step)
+            if success:
+                if baseline is None:
+                    self._baselines[step] = latency
+                else:
+                    # Track the fastest time seen, but let it drift up slowly so a portal
+                    # that stays uniformly slower is eventually treated as the new normal
+                    drifted = baseline * (1 - self.baseline_drift) + latency * self.baseline_drift
+                    self._baselines[step] = min(latency, drifted)
+            ratio = latency / baseline if baseline else 1.0
+
+            self._window.append((ratio, success))
+
+            # A failure is a strong overload signal - react without waiting for a full window
+            if len(self._window) >= self.window_size or not success:
+                self._decide(step)
+
+    def _decide(self, step: str) -> None:
+        """Apply the AIMD rule to the current window (lock must be held)"""
+        samples = list(self._window)
+        self._window.clear()
+
+        errors = sum(1 for _, ok in samples if not ok)
+        error_rate = errors / len(samples)
+        ratios = [ratio for ratio, ok in samples if ok]
+        latency_ratio = sum(ratios) / len(ratios) if ratios else 0.0
+
+        old_limit = self.limit
+        # An overload failure always forces a decision, so it is the newest sample here -
+        # never let the healthy samples before it in the window turn that into an increase
+        if errors:
+            action = "decrease"
+            reason = f"overload error rate {error_rate:.0%}"
+            self.limit = max(float(self.min_concurrency), self.limit * self.multiplicative_decrease)
+        elif latency_ratio > self.latency_tolerance:
+            action = "decrease"
+            reason = f"latency {latency_ratio:.2f}x baseline"
+            self.limit = max(float(self.min_concurrency), self.limit * self.multiplicative_decrease)
+        elif self.in_flight >= self.current_limit:
+            action = "increase"
+            reason = f"healthy at limit (latency {latency_ratio:.2f}x)"
+            self.limit = min(float(self.max_concurrency), self.limit + self.additive_increase)
+        else:
+            action = "hold"
+            reason = f"healthy, limit not saturated (latency {latency_ratio:.2f}x)"
+
+        if self.limit == old_limit and action != "hold":
+            reason += " - already at bound"
+            action = "hold"
+
+        self._decisions.append({
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "step": step,
+            "action": action,
+            "reason": reason,
+            "from_limit": int(old_limit),
+            "to_limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "samples": len(samples),
+            "error_rate": round(error_rate, 3),
+            "latency_ratio": round(latency_ratio, 3)
+        })
+
+        if int(old_limit) != self.current_limit:
+            arrow = "📈" if action == "increase" else "📉"
+            print(f"   {arrow} Concurrency {int(old_limit)} → {self.current_limit} ({reason})")
+
+        self._cond.notify_all()
+
+    def metrics(self) -> Dict:
+        """Snapshot of controller settings, counters and decisions"""
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "min_concurrency": self.min_concurrency,
+                "min_request_spacing": self.min_request_spacing,
+                "final_limit": self.current_limit,
+                "peak_in_flight": self.peak_in_flight,
+                "step_samples": self._samples,
+                "step_errors": self._errors,
+                "overload_errors": self._errors - self._business_errors,
+                "step_baselines": {step: round(value, 3) for step, value in self._baselines.items()},
+                "decisions": list(self._decisions)
+            }
@@ -4,20 +4,69 @@ Apply for IPOs across multiple accounts with a single command
 """
 
 import json
+import math
 import os
+import sqlite3
+import threading
 from datetime import datetime
 from typing import List, Dict, Optional
 import time
 
+from concurrency_controller import AdaptiveConcurrencyController, is_overload_error
+from run_analytics import RunAnalytics
+from step_plan import MEROSHARE_URL, PlanEngine, compile_plan, console
+
+
+class StepTimer:
+    """Time consecutive automation steps and report them to the concurrency controller"""
+    
+    def __init__(self, controller: Optional[AdaptiveConcurrencyController] = None):
+        self.controller = controller
+        self.steps = []
+        self._name = None
+        self._started = 0.0
+    
+    def start(self, name: str) -> None:
+        """Close the running step (if any) and start timing a new one"""
+        self.finish()
+        self._name = name
+        self._started = time.monotonic()
+    
+    def finish(self, error: Optional[Exception] = None) -> None:
+        """Close the running step, marking it failed if an error is given"""
+        if self._name is None:
+            return
+        
+        latency = time.monotonic() - self._started
+        self.steps.append({
+            "step": self._name,
+            "duration": round(latency, 3),
+            "success": error is None,
+            "error": str(error) if error else None
+        })
+        if self.controller:
+            self.controller.record_step(
+                self._name, latency, success=error is None, overload=is_overload_error(error)
+            )
+        self._name = None
+
 
 class MeroshareAutomation:
     """Main automation class for Meroshare IPO applications"""
     
-    def __init__(self, accounts_file: str = "config/accounts.json"):
+    def __init__(
+        self,
+        accounts_file: str = "config/accounts.json",
+        max_concurrency: int = 3,
+        min_request_spacing: float = 2.0
+    ):
         self.accounts_file = accounts_file
         self.accounts = []
         self.log_file = "logs/ipo_applications.log"
         self.use_playwright = False
+        self.max_concurrency = max_concurrency
+        self.min_request_spacing = min_request_spacing
+        self._lock = threading.Lock()
         
         # Check if playwright is available
         try:
@@ -60,15 +109,17 @@ class MeroshareAutomation:
         print(f"📊 Accounts: {len(self.accounts)}")
         print("="*80 + "\n")
         
+        # One compiled plan drives both real automation and printed instructions
+        plan = compile_plan(ipo_company, kitta)
+        
         if self.use_playwright:
             # Execute actual automation
-            self._execute_playwright_automation(ipo_company, kitta)
+            self._execute_playwright_automation(ipo_company, kitta, plan)
         else:
             # Print instructions only
+            engine = PlanEngine(plan)
             for idx, account in enumerate(self.accounts, 1):
-                bank = account['bank_details']
-                crn = account.get('crn', 'YOUR_CRN_FROM_BANK')
-                self._print_account_commands(idx, account, ipo_company, kitta, crn, bank)
+                self._print_account_commands(idx, account, ipo_company, kitta, engine)
         
         print("\n" + "="*80)
         print("✅ AUTOMATION COMPLETED!" if self.use_playwright else "✅ AUTOMATION STEPS GENERATED!")
@@ -78,496 +129,171 @@ class MeroshareAutomation:
         print(f"📸 Screenshots saved in: screenshots/")
         print(f"📋 Logs saved in: {self.log_file}\n")
     
-    def _execute_playwright_automation(self, ipo_company: str, kitta: int) -> None:
+    def _execute_playwright_automation(self, ipo_company: str, kitta: int, plan: Dict) -> None:
         """Execute actual Playwright automation"""
-        from playwright.sync_api import sync_playwright
         
         print("🤖 Starting Playwright automation...\n")
         
         # Ask for slow mode (for debugging)
         slow_mode = input("Run in slow mode for debugging? (y/n, default: n): ").strip().lower()
         slow_motion = 1000 if slow_mode == 'y' else 500
+        engine = PlanEngine(plan, verbose=slow_mode == 'y')
+        
+        controller = AdaptiveConcurrencyController(
+            # Keep debug output readable - one account at a time in slow mode
+            max_concurrency=1 if slow_mode == 'y' else self.max_concurrency,
+            min_request_spacing=self.min_request_spacing
+        )
+        print(f"⚙️  Concurrency: adaptive, up to {controller.max_concurrency} account(s) in parallel, "
+              f"{controller.min_request_spacing}s between requests\n")
+        
+        run = {
+            "run_id": datetime.now().strftime("%Y%m%d_%H%M%S"),
+            "ipo_company": ipo_company,
+            "kitta": kitta,
+            "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "accounts": []
+        }
+        run_started = time.monotonic()
         
+        workers = []
         for idx, account in enumerate(self.accounts, 1):
-            print(f"\n{'='*80}")
-            print(f"🔄 Processing Account {idx}/{len(self.accounts)}: {account['account_name']}")
-            print(f"{'='*80}\n")
-            
-            browser = None
-            try:
-                with sync_playwright() as p:
-                    browser = p.chromium.launch(
-                        headless=False,
-                        slow_mo=slow_motion  # Slow down actions for visibility
-                    )
-                    context = browser.new_context(
-                        viewport={'width': 1366, 'height': 768},  # Standard laptop size
-                        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                    )
-                    page = context.new_page()
-                    
-                    # Create screenshots directory
-                    os.makedirs("screenshots", exist_ok=True)
-                    
-                    username = account['username']
-                    password = account['password']
-                    pin = account['transaction_pin']
-                    crn = account.get('crn', '')
-                    bank = account['bank_details']
-                    
-                    print("1️⃣  Navigating to Meroshare...")
-                    page.goto("https://meroshare.cdsc.com.np/", wait_until="domcontentloaded")
-                    time.sleep(3)
-                    
-                    # Debug: Print page title and URL
-                    if slow_mode == 'y':
-                        print(f"   📄 Page title: {page.title()}")
-                        print(f"   🌐 Current URL: {page.url}")
-                        print(f"   ⏳ Waiting for page to fully load...")
-                    
-                    # Wait for page to be ready
-                    page.wait_for_load_state("networkidle", timeout=20000)
-                    time.sleep(2)
-                    
-                    print("2️⃣  Selecting DP...")
-                    
-                    # Meroshare uses Select2 dropdown library
-                    # Need to click the Select2 container, then select the option
-                    try:
-                        print(f"   🔍 Looking for Select2 dropdown...")
-                        
-                        # Wait for Select2 to be ready
-                        page.wait_for_selector(".select2-selection", state="visible", timeout=10000)
-                        
-                        # Click the Select2 dropdown to open it
-                        page.click(".select2-selection")
-                        time.sleep(1)
-                        
-                        if slow_mode == 'y':
-                            print(f"   📋 Select2 dropdown opened")
-                        
-                        # Extract DP number from dp_name (e.g., "13800" from "LINCH STOCK MARKET LIMITED (13800)")
-                        import re
-                        dp_match = re.search(r'\((\d+)\)', account['dp_name'])
-                        if dp_match:
-                            dp_search_text = dp_match.group(1)  # Extract the number inside parentheses
-                        else:
-                            dp_search_text = account['dp_name'][:20]  # Fallback to first 20 chars
-                        
-                        page.fill(".select2-search__field", dp_search_text)
-                        time.sleep(1.5)  # Give it more time to search and filter
-                        
-                        if slow_mode == 'y':
-                            print(f"   🔍 Searching for DP with number: {dp_search_text}")
-                        
-                        # Click the first result
-                        page.click(".select2-results__option:first-child")
-                        time.sleep(2)
-                        print(f"   ✅ DP selected")
-                        
-                        # IMPORTANT: After selecting DP, the form elements load dynamically
-                        if slow_mode == 'y':
-                            print(f"   ⏳ Waiting for login form to load...")
-                        
-                        # Wait for the form to appear after DP selection
-                        page.wait_for_load_state("networkidle", timeout=10000)
-                        time.sleep(2)
-                        
-                    except Exception as e:
-                        print(f"   ❌ Select2 method failed: {e}")
-                        raise
-                    
-                    time.sleep(1)
-                    
-                    print("3️⃣  Entering credentials...")
-                    
-                    # Try multiple possible selectors for username/password fields
-                    username_selectors = [
-                        "input[placeholder='User Id / Username']",
-                        "input[formcontrolname='username']",
-                        "input#username",
-                        "input[type='text']"
-                    ]
-                    
-                    password_selectors = [
-                        "input[placeholder='Password']",
-                        "input[formcontrolname='password']",
-                        "input#password",
-                        "input[type='password']"
-                    ]
-                    
-                    # Try to find and fill username
-                    username_filled = False
-                    for selector in username_selectors:
-                        try:
-                            page.wait_for_selector(selector, state="visible", timeout=5000)
-                            page.fill(selector, username)
-                            if slow_mode == 'y':
-                                print(f"   ✅ Username filled using: {selector}")
-                            username_filled = True
-                            break
-                        except:
-                            continue
-                    
-                    if not username_filled:
-                        # Debug: List all input fields
-                        if slow_mode == 'y':
-                            inputs = page.locator("input").count()
-                            print(f"   📋 Found {inputs} input fields")
-                            for i in range(min(inputs, 5)):
-                                input_type = page.locator("input").nth(i).get_attribute("type")
-                                input_placeholder = page.locator("input").nth(i).get_attribute("placeholder")
-                                input_id = page.locator("input").nth(i).get_attribute("id")
-                                print(f"   Input {i}: type={input_type}, placeholder={input_placeholder}, id={input_id}")
-                        raise Exception("Could not find username field")
-                    
-                    # Try to find and fill password
-                    password_filled = False
-                    for selector in password_selectors:
-                        try:
-                            page.wait_for_selector(selector, state="visible", timeout=5000)
-                            page.fill(selector, password)
-                            if slow_mode == 'y':
-                                print(f"   ✅ Password filled using: {selector}")
-                            password_filled = True
-                            break
-                        except:
-                            continue
-                    
-                    if not password_filled:
-                        raise Exception("Could not find password field")
-                    
-                    time.sleep(0.5)
-                    
-                    print("4️⃣  Logging in...")
-                    page.click("button:has-text('Login')")
-                    
-                    if slow_mode == 'y':
-                        print(f"   ⏳ Waiting for login to complete...")
-                    
-                    page.wait_for_load_state("networkidle", timeout=15000)
-                    time.sleep(3)
-                    
-                    # Check if login was successful
-                    if slow_mode == 'y':
-                        print(f"   🌐 Current URL after login: {page.url}")
-                        print(f"   📄 Page title: {page.title()}")
-                    
-                    print("5️⃣  Navigating to ASBA section...")
-                    page.goto("https://meroshare.cdsc.com.np/#/asba", wait_until="domcontentloaded")
-                    time.sleep(4)  # Wait for Angular to render
-                    
-                    if slow_mode == 'y':
-                        print(f"   🌐 Current URL: {page.url}")
-                        print(f"   📄 Page title: {page.title()}")
-                    
-                    page.wait_for_load_state("networkidle", timeout=15000)
-                    time.sleep(2)
-                    
-                    print("6️⃣  Looking for IPO...")
-                    # Wait for the page content to load - try different selectors
-                    try:
-                        # Try to wait for any content indicating IPOs are loaded
-                        page.wait_for_selector("body", state="visible", timeout=5000)
-                        time.sleep(5)  # Extra wait for Angular to fully render the IPO cards
-                        
-                        # Take screenshot FIRST to debug
-                        page.screenshot(path=f"screenshots/debug_ipo_list_{username}.png", full_page=True)
-                        if slow_mode == 'y':
-                            print(f"   📸 Debug screenshot saved")
-                            
-                        # The IPOs are NOT in a table - they're in card/div layouts!
-                        # Look for the Apply button directly
-                        apply_buttons = page.locator("button:has-text('Apply')").count()
-                        
-                        print(f"   📋 Found {apply_buttons} IPO(s) to apply")
-                        
-                        if apply_buttons == 0:
-                            # Debug: print page content
-                            if slow_mode == 'y':
-                                print(f"   🔍 Page URL: {page.url}")
-                                print(f"   🔍 Page title: {page.title()}")
-                                # Try to find any visible text about IPOs
-                                page_text = page.locator("body").inner_text()
-                                if "No data available" in page_text or "no record" in page_text.lower():
-                                    print(f"   ⚠️  Page shows 'No data available'")
-                                else:
-                                    print(f"   📄 Page has content, but can't find Apply buttons")
-                            
-                            print(f"   ⚠️  No IPOs found - might be closed or already applied")
-                            raise Exception("No IPOs available to apply")
-                        
-                        # Click the first Apply button (no need to select row - different UI)
-                        if slow_mode == 'y':
-                            print(f"   🔍 Clicking Apply button for first IPO...")
-                        
-                        # Click the first enabled Apply button
-                        page.locator("button:has-text('Apply')").first.click()
-                        time.sleep(3)  # Wait for the application form to load
-                        
-                        if slow_mode == 'y':
-                            print(f"   ✅ Apply button clicked, form should be loading...")
-                            page.screenshot(path=f"screenshots/debug_after_apply_{username}.png", full_page=True)
-                            print(f"   📸 After-apply screenshot saved")
-                        
-                    except Exception as e:
-                        print(f"❌ Could not find IPO or Apply button: {str(e)}")
-                        browser.close()
-                        continue
-                    
-                    print("7️⃣  Selecting bank...")
-                    # Wait for the form to fully load after clicking Apply
-                    time.sleep(3)
-                    page.wait_for_load_state("networkidle", timeout=10000)
-                    
-                    if slow_mode == 'y':
-                        print(f"   📋 Form loaded, looking for bank dropdown...")
-                    
-                    # The form uses REGULAR select dropdowns, not Select2!
-                    # Look for the Bank dropdown by label or common selectors
-                    try:
-                        # Wait for bank dropdown to appear
-                        page.wait_for_selector("select", state="visible", timeout=10000)
-                        time.sleep(1)
-                        
-                        # Find all select elements
-                        selects = page.locator("select").all()
-                        
-                        if slow_mode == 'y':
-                            print(f"   📋 Found {len(selects)} select dropdown(s)")
-                        
-                        # First select should be Bank
-                        if len(selects) > 0:
-                            # Select bank by visible text
-                            selects[0].select_option(label=bank['bank_name'])
-                            time.sleep(3)  # Wait for account dropdown and branch to populate
-                            
-                            if slow_mode == 'y':
-                                print(f"   ✅ Bank selected: {bank['bank_name']}")
-                        else:
-                            raise Exception("Could not find bank dropdown")
-                    except Exception as e:
-                        print(f"   ❌ Bank selection failed: {e}")
-                        raise
-                    
-                    print("8️⃣  Selecting account number...")
-                    # After bank selection, account dropdown should appear
-                    try:
-                        time.sleep(3)  # Wait longer for account dropdown options to load
-                        
-                        # Wait for account dropdown to be populated
-                        page.wait_for_selector("select#accountNumber option:not([value=''])", state="attached", timeout=10000)
-                        time.sleep(1)
-                        
-                        # Get the account select element
-                        account_select = page.locator("select#accountNumber, select[name='accountNumber']")
-                        
-                        if slow_mode == 'y':
-                            # Check how many options are available
-                            options_count = account_select.locator("option").count()
-                            print(f"   📋 Found {options_count} account option(s)")
-                        
-                        # Extract just the account number (remove " - SAVING ACCOUNT" part)
-                        account_num = bank['account_number'].split(' - ')[0].strip()
-                        
-                        if slow_mode == 'y':
-                            print(f"   🔍 Looking for account: {account_num}")
-                        
-                        # Try to select by value or label containing the account number
-                        try:
-                            # First try: select by value (account number might be the value)
-                            account_select.select_option(value=account_num)
-                            if slow_mode == 'y':
-                                print(f"   ✅ Account selected by value")
-                        except:
-                            try:
-                                # Second try: select by label (visible text)
-                                account_select.select_option(label=account_num)
-                                if slow_mode == 'y':
-                                    print(f"   ✅ Account selected by label")
-                            except:
-                                # Third try: select the first non-empty option
-                                account_select.select_option(index=1)  # Skip first empty option
-                                if slow_mode == 'y':
-                                    print(f"   ✅ Account selected by index (first available)")
-                        
-                        time.sleep(2)  # Wait for selection to register
-                        
-                    except Exception as e:
-                        print(f"   ⚠️  Account selection error: {e}")
-                        if slow_mode == 'y':
-                            # Debug: show what options are available
-                            try:
-                                options = page.locator("select#accountNumber option").all()
-                                print(f"   🔍 Available options: {len(options)}")
-                                for i, opt in enumerate(options[:5]):  # Show first 5
-                                    opt_text = opt.inner_text()
-                                    opt_value = opt.get_attribute("value")
-                                    print(f"      Option {i}: text='{opt_text}', value='{opt_value}'")
-                            except:
-                                pass
-                    
-                    # Skip branch - it auto-fills when bank is selected (readonly field)
-                    if slow_mode == 'y':
-                        print(f"   ℹ️  Branch auto-filled by system")
-                    time.sleep(1)  # Wait for branch to auto-fill
-                    
-                    print("9️⃣  Entering Applied Kitta (slowly to trigger calculation)...")
-                    try:
-                        kitta_field = page.locator("input[placeholder*='Applied Kitta'], input[placeholder*='Kitta Number']")
-                        kitta_field.wait_for(state="visible", timeout=5000)
-                        
-                        # Click to focus
-                        kitta_field.click()
-                        time.sleep(0.5)
-                        
-                        # Type each digit slowly to trigger amount calculation
-                        kitta_str = str(kitta)
-                        for digit in kitta_str:
-                            page.keyboard.type(digit)
-                            time.sleep(0.3)  # Delay between each character
-                        
-                        time.sleep(1)  # Wait for amount to calculate
-                        
-                        if slow_mode == 'y':
-                            print(f"   ✅ Kitta entered: {kitta}")
-                    except Exception as e:
-                        print(f"   ❌ Kitta field error: {e}")
-                        raise
-                    
-                    print("9️⃣  Verifying Amount calculation...")
-                    # Amount should auto-calculate after kitta entry
-                    try:
-                        amount_field = page.locator("input[placeholder*='Amount'], input[formcontrolname='amount']")
-                        time.sleep(1)  # Wait for calculation
-                        
-                        # Get the calculated amount
-                        current_amount = amount_field.input_value()
-                        
-                        if slow_mode == 'y':
-                            print(f"   ✅ Amount auto-calculated: {current_amount}")
-                        
-                        if not current_amount or current_amount == "":
-                            print(f"   ⚠️  Amount not calculated, clicking amount field to trigger...")
-                            amount_field.click()
-                            time.sleep(1)
-                            current_amount = amount_field.input_value()
-                            if slow_mode == 'y':
-                                print(f"   📋 Amount after click: {current_amount}")
-                        
-                    except Exception as e:
-                        print(f"   ⚠️  Amount field error: {e}")
-                    
-                    print("🔟  Entering CRN...")
-                    try:
-                        page.wait_for_selector("input[placeholder*='CRN']", state="visible", timeout=5000)
-                        page.fill("input[placeholder*='CRN']", crn)
-                        time.sleep(0.5)
-                        
-                        if slow_mode == 'y':
-                            print(f"   ✅ CRN entered: {crn}")
-                    except Exception as e:
-                        print(f"   ❌ CRN field error: {e}")
-                        raise
-                    
-                    print("1️⃣1️⃣  Accepting terms...")
-                    try:
-                        # Wait a moment for all fields to be validated
-                        time.sleep(1)
-                        
-                        page.check("input[type='checkbox']")
-                        time.sleep(1)  # Wait for validation after checkbox
-                        
-                        if slow_mode == 'y':
-                            print(f"   ✅ Terms checkbox checked")
-                    except Exception as e:
-                        print(f"   ⚠️  Checkbox error: {e}")
-                    
-                    print("1️⃣2️⃣  Taking screenshot before submit...")
-                    page.screenshot(path=f"screenshots/before_submit_{username}.png", full_page=True)
-                    
-                    if slow_mode == 'y':
-                        print(f"   📸 Pre-submit screenshot saved")
-                    
-                    print("1️⃣3️⃣  Clicking Proceed...")
-                    try:
-                        # Wait for button to become enabled (form validation completes)
-                        time.sleep(2)
-                        
-                        # Click the Proceed button (should be enabled now)
-                        page.click("button:has-text('Proceed'):not([disabled])")
-                        time.sleep(3)
-                        
-                        if slow_mode == 'y':
-                            print(f"   ✅ Proceed button clicked")
-                    except Exception as e:
-                        print(f"   ❌ Proceed button error: {e}")
-                        # Try to check if button is still disabled
-                        if slow_mode == 'y':
-                            is_disabled = page.locator("button:has-text('Proceed')").get_attribute("disabled")
-                            print(f"   🔍 Button disabled status: {is_disabled}")
-                            # Take debug screenshot
-                            page.screenshot(path=f"screenshots/debug_proceed_failed_{username}.png", full_page=True)
-                            print(f"   📸 Debug screenshot saved")
-                        raise
-                    
-                    print("1️⃣2️⃣  Entering PIN...")
-                    page.wait_for_selector("input[type='password']", state="visible", timeout=10000)
-                    # PIN field is usually the only password field on this page
-                    pin_inputs = page.locator("input[type='password']").all()
-                    if pin_inputs:
-                        pin_inputs[-1].fill(pin)  # Last password field is PIN
-                    time.sleep(0.5)
-                    
-                    print("📸 Taking screenshot with PIN...")
-                    page.screenshot(path=f"screenshots/pin_entered_{username}.png", full_page=True)
-                    
-                    print("1️⃣3️⃣  Submitting application...")
-                    page.click("button:has-text('Submit'), button:has-text('Apply')")
-                    time.sleep(4)
-                    
-                    print("📸 Taking success screenshot...")
-                    page.screenshot(path=f"screenshots/success_{username}.png", full_page=True)
-                    
-                    print("1️⃣4️⃣  Navigating to Application Report...")
-                    page.goto("https://meroshare.cdsc.com.np/#/ipo/report", wait_until="networkidle")
-                    time.sleep(3)
-                    
-                    print("📸 Taking report screenshot...")
-                    page.screenshot(path=f"screenshots/report_{username}.png", full_page=True)
-                    
-                    print(f"\n✅ Application submitted for {account['account_name']}")
+            # Blocks until the controller has a free slot for another account
+            controller.acquire()
+            worker = threading.Thread(
+                target=self._account_worker,
+                args=(idx, account, ipo_company, engine, slow_motion, controller, run),
+                name=f"account-{idx}"
+            )
+            worker.start()
+            workers.append(worker)
+        
+        for worker in workers:
+            worker.join()
+        
+        run["finished_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        run["duration"] = round(time.monotonic() - run_started, 3)
+        run["concurrency"] = controller.metrics()
+        self._save_run_metrics(run)
+    
+    def _account_worker(
+        self,
+        idx: int,
+        account: Dict,
+        ipo_company: str,
+        engine: PlanEngine,
+        slow_motion: int,
+        controller: AdaptiveConcurrencyController,
+        run: Dict
+    ) -> None:
+        """Apply for one account on a worker thread and collect its metrics"""
+        try:
+            record = self._apply_for_account(idx, account, ipo_company, engine, slow_motion, controller)
+        except Exception as e:
+            # Failed before the account's own error handling (e.g. malformed account config) -
+            # still record it so the run metrics count every account
+            account_name = account.get('account_name', f"Account {idx}")
+            console(f"\n❌ Error processing {account_name}: {str(e)}")
+            record = {
+                "account_name": account_name,
+                "username": account.get('username'),
+                "status": f"Error: {str(e)}",
+                "steps": [],
+                "duration": 0.0
+            }
+            self._log_application(account_name, record["status"], ipo_company)
+        finally:
+            controller.release()
+        with self._lock:
+            run["accounts"].append(record)
+    
+    def _apply_for_account(
+        self,
+        idx: int,
+        account: Dict,
+        ipo_company: str,
+        engine: PlanEngine,
+        slow_motion: int,
+        controller: Optional[AdaptiveConcurrencyController] = None,
+        headless: bool = False,
+        screenshot_dir: str = "screenshots",
+        dry_run: bool = False
+    ) -> Dict:
+        """Run the compiled plan for a single account and return its run record"""
+        from playwright.sync_api import sync_playwright
+        
+        timer = StepTimer(controller)
+        record = {
+            "account_name": account['account_name'],
+            "username": account['username'],
+            "status": "Success",
+            "steps": timer.steps
+        }
+        account_started = time.monotonic()
+        
+        console(f"\n{'='*80}")
+        console(f"🔄 Processing Account {idx}/{len(self.accounts)}: {account['account_name']}")
+        console(f"{'='*80}\n")
+        
+        browser = None
+        page = None
+        try:
+            with sync_playwright() as p:
+                browser = p.chromium.launch(
+                    headless=headless,
+                    slow_mo=slow_motion  # Slow down actions for visibility
+                )
+                context = browser.new_context(
+                    viewport={'width': 1366, 'height': 768},  # Standard laptop size
+                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+                )
+                page = context.new_page()
+                
+                # Create screenshots directory
+                os.makedirs(screenshot_dir, exist_ok=True)
+                
+                engine.run(page, account, timer, controller)
+                
+                console(f"\n✅ Application submitted for {account['account_name']}")
+                if not dry_run:
                     self._log_application(account['account_name'], "Success", ipo_company)
-                    
-                    browser.close()
-                    time.sleep(2)
-                    
-            except Exception as e:
-                print(f"\n❌ Error processing {account['account_name']}: {str(e)}")
-                print(f"   Error type: {type(e).__name__}")
                 
-                # Take error screenshot
-                try:
-                    if page:
-                        error_path = f"screenshots/error_{username}_{int(time.time())}.png"
-                        page.screenshot(path=error_path, full_page=True)
-                        print(f"   📸 Error screenshot saved: {error_path}")
-                        
-                        # Save HTML for debugging
-                        html_path = f"screenshots/error_{username}_{int(time.time())}.html"
-                        with open(html_path, 'w', encoding='utf-8') as f:
-                            f.write(page.content())
-                        print(f"   📄 Page HTML saved: {html_path}")
-                except Exception as screenshot_error:
-                    print(f"   ⚠️  Could not save debug info: {screenshot_error}")
+                browser.close()
+                time.sleep(2)
                 
+        except Exception as e:
+            timer.finish(e)
+            record["status"] = f"Error: {str(e)}"
+            console(f"\n❌ Error processing {account['account_name']}: {str(e)}")
+            console(f"   Error type: {type(e).__name__}")
+            
+            # Take error screenshot
+            try:
+                if page:
+                    username = account['username']
+                    error_path = f"{screenshot_dir}/error_{username}_{int(time.time())}.png"
+                    page.screenshot(path=error_path, full_page=True)
+                    console(f"   📸 Error screenshot saved: {error_path}")
+                    
+                    # Save HTML for debugging
+                    html_path = f"{screenshot_dir}/error_{username}_{int(time.time())}.html"
+                    with open(html_path, 'w', encoding='utf-8') as f:
+                        f.write(page.content())
+                    console(f"   📄 Page HTML saved: {html_path}")
+            except Exception as screenshot_error:
+                console(f"   ⚠️  Could not save debug info: {screenshot_error}")
+            
+            if not dry_run:
                 self._log_application(account['account_name'], f"Error: {str(e)}", ipo_company)
-                
-                try:
-                    if browser:
-                        browser.close()
-                except:
-                    pass
+            
+            try:
+                if browser:
+                    browser.close()
+            except:
+                pass
+        
+        record["duration"] = round(time.monotonic() - account_started, 3)
+        return record
     
     def _print_account_commands(
         self, 
@@ -575,62 +301,159 @@ class MeroshareAutomation:
         account: Dict, 
         ipo_company: str, 
         kitta: int, 
-        crn: str, 
-        bank: Dict
+        engine: PlanEngine
     ) -> None:
-        """Print Playwright commands for a single account"""
+        """Print Playwright commands for a single account from the compiled plan"""
         
         username = account['username']
+        crn = account.get('crn', 'YOUR_CRN_FROM_BANK')
         
         print(f"\n{'='*80}")
         print(f"ACCOUNT {idx}: {account['account_name']}")
         print(f"Username: {username} | Kitta: {kitta} | CRN: {crn}")
         print(f"{'='*80}\n")
         
-        steps = [
-            ("1", "NAVIGATE", f"https://meroshare.cdsc.com.np/"),
-            ("2", "CLICK", f"DP dropdown → Select: {account['dp_name']}"),
-            ("3", "TYPE", f"Username: {username}"),
-            ("4", "TYPE", f"Password: ****"),
-            ("5", "CLICK", "Login button"),
-            ("6", "WAIT", "2 seconds"),
-            ("7", "NAVIGATE", "https://meroshare.cdsc.com.np/#/asba"),
-            ("8", "WAIT", "2 seconds for IPO list"),
-            ("9", "CLICK", f"Apply button for: {ipo_company}"),
-            ("10", "SELECT", f"Bank: {bank['bank_name']}"),
-            ("11", "WAIT", "0.5 seconds"),
-            ("12", "SELECT", f"Account: {bank['account_number']}"),
-            ("13", "VERIFY", f"Branch auto-filled: {bank['branch']}"),
-            ("14", "TYPE", f"Applied Kitta: {kitta}"),
-            ("15", "TYPE", f"CRN: {crn}"),
-            ("16", "CLICK", "Agreement checkbox"),
-            ("17", "SCREENSHOT", f"screenshots/before_submit_{username}.png"),
-            ("18", "CLICK", "Proceed button"),
-            ("19", "WAIT", "1 second"),
-            ("20", "TYPE", f"Transaction PIN: {account['transaction_pin']}"),
-            ("21", "SCREENSHOT", f"screenshots/pin_entered_{username}.png"),
-            ("22", "CLICK", "Apply button (final submit)"),
-            ("23", "WAIT", "2 seconds"),
-            ("24", "SCREENSHOT", f"screenshots/success_{username}.png"),
-            ("25", "CLICK", "Application Report tab"),
-            ("26", "CLICK", "Report button for first IPO"),
-            ("27", "SCREENSHOT", f"screenshots/report_{username}.png"),
-            ("28", "LOG", f"Application completed for {username}"),
-        ]
-        
-        for step_num, action, description in steps:
-            print(f"  {step_num:3s}. [{action:10s}] {description}")
+        missing = engine.missing_fields(account)
+        if missing:
+            print(f"  ⚠️  Missing in account config: {', '.join(missing)}\n")
+        
+        for step_num, action, description in engine.describe(account):
+            print(f"  {step_num:>3s}. [{action:10s}] {description}")
         
         self._log_application(account['account_name'], "Commands Generated", ipo_company)
     
+    def dry_run(self, ipo_company: str, kitta: int = 10, mock_url: Optional[str] = None) -> bool:
+        """Validate the compiled plan and estimate per-account time without applying
+        
+        With a mock_url the plan is also executed headless against that site
+        (e.g. a local replica of Meroshare) for the first enabled account.
+        Returns True if the plan is valid for every enabled account.
+        """
+        self.accounts = self.load_accounts()
+        
+        if not self.accounts:
+            print("❌ No enabled accounts found!")
+            return False
+        
+        print("\n" + "="*80)
+        print(f"🧪 DRY RUN")
+        print(f"📋 IPO: {ipo_company}")
+        print(f"📊 Accounts: {len(self.accounts)}")
+        print("="*80 + "\n")
+        
+        try:
+            plan = compile_plan(
+                ipo_company,
+                kitta,
+                base_url=mock_url or MEROSHARE_URL,
+                screenshot_dir="screenshots/dry_run"
+            )
+        except ValueError as e:
+            print(f"❌ Invalid step plan: {e}")
+            return False
+        
+        engine = PlanEngine(plan)
+        action_count = sum(len(stage["actions"]) for stage in plan["stages"])
+        print(f"✅ Plan compiled: {len(plan['stages'])} stages, {action_count} actions")
+        
+        valid = True
+        for account in self.accounts:
+            missing = engine.missing_fields(account)
+            if missing:
+                valid = False
+                print(f"   ❌ {account['account_name']}: missing {', '.join(missing)}")
+            else:
+                print(f"   ✅ {account['account_name']}: all plan fields present")
+        
+        observed = self._recent_step_durations()
+        estimate = engine.estimate(observed)
+        
+        print(f"\n⏱️  Estimated time per account ({'recent runs' if observed else 'fixed waits + nominal portal time'}):")
+        for name, stage_estimate in estimate["stages"].items():
+            print(f"   {name:26s} {stage_estimate['seconds']:6.1f}s  ({stage_estimate['source']})")
+        print(f"   {'TOTAL':26s} {estimate['per_account']:6.1f}s")
+        
+        # Every account runs the full plan; at best max_concurrency of them overlap
+        batches = math.ceil(len(self.accounts) / self.max_concurrency)
+        print(f"   {len(self.accounts)} account(s): ~{estimate['per_account'] * len(self.accounts) / 60:.1f} min sequential, "
+              f"~{estimate['per_account'] * batches / 60:.1f} min at concurrency {self.max_concurrency}")
+        
+        if mock_url:
+            if not self.use_playwright:
+                print("\n⚠️  Playwright not installed - skipping validation against mock site")
+            elif valid:
+                print(f"\n🧪 Running plan against mock site: {mock_url}")
+                record = self._apply_for_account(
+                    1, self.accounts[0], ipo_company, PlanEngine(plan, verbose=True),
+                    slow_motion=0, headless=True, screenshot_dir="screenshots/dry_run", dry_run=True
+                )
+                if record["status"] != "Success":
+                    valid = False
+                print(f"   {'✅' if record['status'] == 'Success' else '❌'} {record['status']} "
+                      f"in {record['duration']:.1f}s")
+        
+        print("\n" + "="*80)
+        print("✅ DRY RUN PASSED" if valid else "❌ DRY RUN FAILED")
+        print("="*80 + "\n")
+        return valid
+    
+    def _recent_step_durations(self, runs: int = 5) -> Dict[str, float]:
+        """Average successful duration of each step over the most recent runs"""
+        try:
+            analytics = RunAnalytics()
+            try:
+                analytics.sync()
+                return analytics.step_averages(analytics.latest_run_ids(runs))
+            finally:
+                analytics.close()
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not read run history: {e}")
+            return {}
+    
     def _log_application(self, account_name: str, status: str, ipo_company: str) -> None:
         """Log application activity"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_entry = f"[{timestamp}] {account_name} | {ipo_company} | {status}\n"
         
         os.makedirs("logs", exist_ok=True)
-        with open(self.log_file, 'a') as f:
-            f.write(log_entry)
+        with self._lock:
+            with open(self.log_file, 'a') as f:
+                f.write(log_entry)
+    
+    def _save_run_metrics(self, run: Dict) -> None:
+        """Save per-account, per-step and concurrency metrics for a run"""
+        os.makedirs("logs", exist_ok=True)
+        metrics_file = f"logs/run_metrics_{run['run_id']}.json"
+        with open(metrics_file, 'w') as f:
+            json.dump(run, f, indent=2)
+        
+        concurrency = run["concurrency"]
+        succeeded = sum(1 for acc in run["accounts"] if acc["status"] == "Success")
+        changes = [d for d in concurrency["decisions"] if d["from_limit"] != d["to_limit"]]
+        
+        print(f"\n{'='*80}")
+        print("📊 RUN METRICS")
+        print(f"{'='*80}")
+        print(f"   Accounts: {succeeded}/{len(run['accounts'])} succeeded in {run['duration']:.1f}s")
+        print(f"   Concurrency: peak {concurrency['peak_in_flight']} in flight, "
+              f"final limit {concurrency['final_limit']}/{concurrency['max_concurrency']}")
+        print(f"   Step errors: {concurrency['step_errors']}/{concurrency['step_samples']} "
+              f"({concurrency['overload_errors']} timeout/network)")
+        for decision in changes:
+            print(f"   [{decision['timestamp']}] {decision['from_limit']} → {decision['to_limit']} "
+                  f"after {decision['step']}: {decision['reason']}")
+        print(f"   📋 Metrics saved in: {metrics_file}")
+        
+        try:
+            analytics = RunAnalytics()
+            try:
+                analytics.ingest_run(run)
+            finally:
+                analytics.close()
+            print(f"   📈 Added to analytics store: {analytics.db_file}")
+        except sqlite3.Error as e:
+            # The JSON file is the source of truth - it is picked up on the next sync
+            print(f"   ⚠️  Could not update analytics store: {e}")
     
     def list_accounts(self) -> None:
         """List all enabled accounts"""
@@ -663,16 +486,17 @@ def main():
     print("MEROSHARE IPO AUTOMATION")
     print("🎯"*40 + "\n")
     
-    automation = MeroshareAutomation("config/accounts.json")
+    automation = MeroshareAutomation("config/accounts.json", max_concurrency=3, min_request_spacing=2.0)
     
     print("MENU:")
     print("1. List enabled accounts")
     print("2. Generate automation for IPO")
-    print("3. Exit")
+    print("3. Dry-run IPO plan (validate + estimate time)")
+    print("4. Run analytics report")
+    print("5. Exit")
     print()
     
-    # choice = input("Enter choice (1-3): ").strip()
-    choice = "2"
+    choice = input("Enter choice (1-5): ").strip()
     if choice == "1":
         automation.list_accounts()
     
@@ -693,6 +517,21 @@ def main():
         automation.generate_playwright_commands(ipo_company, kitta)
     
     elif choice == "3":
+        # ipo_company = input("\nEnter IPO company name: ").strip()
+        ipo_company = "SY Panel Nepal Limited"
+        kitta = 10
+        mock_url = input("Mock site URL to run the plan against (blank to skip): ").strip() or None
+        
+        automation.dry_run(ipo_company, kitta, mock_url)
+    
+    elif choice == "4":
+        analytics = RunAnalytics()
+        try:
+            analytics.print_report()
+        finally:
+            analytics.close()
+    
+    elif choice == "5":
         print("\n👋 Goodbye!\n")
     
     else:
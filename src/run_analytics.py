@@ -0,0 +1,360 @@
+"""
+Meroshare Run Analytics
+Local SQLite store of every run's per-account and per-step records,
+with reports for comparing IPO-day runs over time
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    ipo_company TEXT,
+    kitta INTEGER,
+    started_at TEXT,
+    finished_at TEXT,
+    duration REAL,
+    accounts_total INTEGER,
+    accounts_succeeded INTEGER,
+    max_concurrency INTEGER,
+    peak_in_flight INTEGER,
+    final_limit INTEGER,
+    step_errors INTEGER
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    username TEXT,
+    account_name TEXT,
+    status TEXT,
+    success INTEGER,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    account_id INTEGER NOT NULL REFERENCES accounts(id),
+    username TEXT,
+    seq INTEGER,
+    step TEXT,
+    duration REAL,
+    success INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    timestamp TEXT,
+    step TEXT,
+    action TEXT,
+    from_limit INTEGER,
+    to_limit INTEGER,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at);
+CREATE INDEX IF NOT EXISTS idx_accounts_run ON accounts(run_id, username);
+CREATE INDEX IF NOT EXISTS idx_steps_run ON steps(run_id, step);
+CREATE INDEX IF NOT EXISTS idx_decisions_run ON decisions(run_id);
+"""
+
+# Recent runs considered by the slowest-accounts/steps reports
+RECENT_RUNS = "SELECT run_id FROM runs ORDER BY started_at DESC, run_id DESC LIMIT ?"
+
+
+class RunAnalytics:
+    """Ingest run metrics into SQLite and report trends, regressions and hot spots"""
+
+    def __init__(self, db_file: str = "logs/analytics.db", metrics_dir: str = "logs"):
+        self.db_file = db_file
+        self.metrics_dir = metrics_dir
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_file)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # -- ingestion ------------------------------------------------------------
+
+    def ingest_run(self, run: Dict) -> bool:
+        """Store one run (the run_metrics dict); returns False if it was already stored"""
+        concurrency = run.get("concurrency", {})
+        accounts = run.get("accounts", [])
+
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run["run_id"], run.get("ipo_company"), run.get("kitta"),
+                    run.get("started_at"), run.get("finished_at"), run.get("duration"),
+                    len(accounts), sum(1 for acc in accounts if acc.get("status") == "Success"),
+                    concurrency.get("max_concurrency"), concurrency.get("peak_in_flight"),
+                    concurrency.get("final_limit"), concurrency.get("step_errors"),
+                )
+            )
+            if cursor.rowcount == 0:
+                return False
+
+            for account in accounts:
+                account_id = self.conn.execute(
+                    "INSERT INTO accounts (run_id, username, account_name, status, success, duration) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        run["run_id"], account.get("username"), account.get("account_name"),
+                        account.get("status"), int(account.get("status") == "Success"),
+                        account.get("duration"),
+                    )
+                ).lastrowid
+                self.conn.executemany(
+                    "INSERT INTO steps (run_id, account_id, username, seq, step, duration, success, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            run["run_id"], account_id, account.get("username"), seq, step["step"],
+                            step["duration"], int(bool(step.get("success"))), step.get("error"),
+                        )
+                        for seq, step in enumerate(account.get("steps", []), 1)
+                    ]
+                )
+
+            self.conn.executemany(
+                "INSERT INTO decisions (run_id, timestamp, step, action, from_limit, to_limit, reason) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run["run_id"], d.get("timestamp"), d.get("step"), d.get("action"),
+                        d.get("from_limit"), d.get("to_limit"), d.get("reason"),
+                    )
+                    for d in concurrency.get("decisions", [])
+                ]
+            )
+        return True
+
+    def sync(self) -> int:
+        """Ingest any logs/run_metrics_*.json not stored yet; returns how many were added"""
+        known = {row[0] for row in self.conn.execute("SELECT run_id FROM runs")}
+        added = 0
+        for metrics_file in sorted(glob.glob(os.path.join(self.metrics_dir, "run_metrics_*.json"))):
+            run_id = os.path.basename(metrics_file)[len("run_metrics_"):-len(".json")]
+            if run_id in known:
+                continue
+            try:
+                with open(metrics_file, 'r') as f:
+                    run = json.load(f)
+                # A missing key rolls back the whole run (ingest_run is one transaction)
+                if self.ingest_run(run):
+                    added += 1
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"⚠️  Skipping unreadable metrics file {metrics_file}: {e!r}")
+        return added
+
+    # -- queries --------------------------------------------------------------
+
+    def latest_run_ids(self, limit: int = 2) -> List[str]:
+        return [row[0] for row in self.conn.execute(RECENT_RUNS, (limit,))]
+
+    def previous_run_id(self, run_id: str) -> Optional[str]:
+        """The run recorded just before the given one (run ids are timestamps)"""
+        row = self.conn.execute(
+            "SELECT run_id FROM runs WHERE run_id < ? ORDER BY run_id DESC LIMIT 1", (run_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def run_trends(self, limit: int = 10) -> List[sqlite3.Row]:
+        """Most recent runs, oldest first"""
+        rows = self.conn.execute(
+            """
+            SELECT r.*, (SELECT AVG(a.duration) FROM accounts a
+                         WHERE a.run_id = r.run_id AND a.success = 1) AS avg_account_duration
+            FROM runs r ORDER BY r.started_at DESC, r.run_id DESC LIMIT ?
+            """,
+            (limit,)
+        ).fetchall()
+        return list(reversed(rows))
+
+    def success_by_concurrency(self) -> List[sqlite3.Row]:
+        """Success rate and time per account grouped by peak parallel accounts"""
+        return self.conn.execute(
+            """
+            SELECT peak_in_flight, COUNT(*) AS runs,
+                   SUM(accounts_succeeded) AS succeeded, SUM(accounts_total) AS total,
+                   SUM(duration) / SUM(accounts_total) AS seconds_per_account
+            FROM runs WHERE accounts_total > 0
+            GROUP BY peak_in_flight ORDER BY peak_in_flight
+            """
+        ).fetchall()
+
+    def step_averages(self, run_ids: List[str]) -> Dict[str, float]:
+        """Average successful duration of each step across the given runs"""
+        if not run_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in run_ids)
+        rows = self.conn.execute(
+            f"SELECT step, AVG(duration) FROM steps WHERE run_id IN ({placeholders}) AND success = 1 GROUP BY step",
+            run_ids
+        )
+        return {step: duration for step, duration in rows}
+
+    def compare_runs(self, run_id: str, baseline_id: str, min_ratio: float = 1.25, min_delta: float = 0.5) -> Dict:
+        """Per-step comparison of a run against a baseline, flagging regressions"""
+        current = self.step_averages([run_id])
+        baseline = self.step_averages([baseline_id])
+
+        steps = []
+        for step in sorted(set(current) | set(baseline)):
+            now, before = current.get(step), baseline.get(step)
+            delta = now - before if now is not None and before is not None else None
+            # No ratio against a 0s baseline - the absolute delta alone decides
+            ratio = now / before if delta is not None and before else None
+            steps.append({
+                "step": step,
+                "baseline": before,
+                "current": now,
+                "delta": delta,
+                "ratio": ratio,
+                "regressed": delta is not None and delta >= min_delta and (ratio is None or ratio >= min_ratio),
+            })
+        steps.sort(key=lambda s: s["delta"] if s["delta"] is not None else 0, reverse=True)
+
+        runs = {
+            row["run_id"]: row
+            for row in self.conn.execute(
+                "SELECT * FROM runs WHERE run_id IN (?, ?)", (run_id, baseline_id)
+            )
+        }
+        return {"run": runs.get(run_id), "baseline": runs.get(baseline_id), "steps": steps}
+
+    def slowest_accounts(self, runs: int = 20, limit: int = 5) -> List[sqlite3.Row]:
+        return self.conn.execute(
+            f"""
+            SELECT username, MAX(account_name) AS account_name, COUNT(*) AS attempts,
+                   SUM(success) AS succeeded,
+                   AVG(CASE WHEN success = 1 THEN duration END) AS avg_duration,
+                   MAX(CASE WHEN success = 1 THEN duration END) AS max_duration
+            FROM accounts WHERE run_id IN ({RECENT_RUNS})
+            GROUP BY username ORDER BY avg_duration DESC LIMIT ?
+            """,
+            (runs, limit)
+        ).fetchall()
+
+    def slowest_steps(self, runs: int = 20, limit: int = 5) -> List[sqlite3.Row]:
+        return self.conn.execute(
+            f"""
+            SELECT step, COUNT(*) AS samples, SUM(1 - success) AS failures,
+                   AVG(CASE WHEN success = 1 THEN duration END) AS avg_duration,
+                   MAX(CASE WHEN success = 1 THEN duration END) AS max_duration
+            FROM steps WHERE run_id IN ({RECENT_RUNS})
+            GROUP BY step ORDER BY avg_duration DESC LIMIT ?
+            """,
+            (runs, limit)
+        ).fetchall()
+
+    # -- reporting ------------------------------------------------------------
+
+    def print_report(
+        self,
+        run_id: Optional[str] = None,
+        baseline_id: Optional[str] = None,
+        last: int = 10,
+        top: int = 5
+    ) -> None:
+        """Print trends, regressions against a baseline, and the slowest accounts/steps"""
+        added = self.sync()
+
+        print(f"\n{'='*80}")
+        print("📈 RUN ANALYTICS")
+        print(f"{'='*80}")
+        if added:
+            print(f"   📥 Ingested {added} new run(s) into {self.db_file}")
+
+        trends = self.run_trends(last)
+        if not trends:
+            print("\n❌ No runs recorded yet - run the automation first\n")
+            return
+
+        print(f"\n📊 Last {len(trends)} run(s):")
+        print(f"   {'RUN':16s} {'IPO':24s} {'OK':>7s} {'RATE':>5s} {'AVG/ACC':>8s} {'CONC':>5s} {'ERRS':>5s}")
+        for row in trends:
+            rate = row["accounts_succeeded"] / row["accounts_total"] if row["accounts_total"] else 0
+            avg = f"{row['avg_account_duration']:.1f}s" if row["avg_account_duration"] is not None else "-"
+            print(f"   {row['run_id']:16s} {(row['ipo_company'] or '')[:24]:24s} "
+                  f"{row['accounts_succeeded']:>3d}/{row['accounts_total']:<3d} {rate:>5.0%} {avg:>8s} "
+                  f"{row['peak_in_flight'] or 0:>2d}/{row['max_concurrency'] or 0:<2d} {row['step_errors'] or 0:>5d}")
+
+        print("\n⚡ Success rate by peak concurrency (all runs):")
+        for row in self.success_by_concurrency():
+            rate = row["succeeded"] / row["total"] if row["total"] else 0
+            print(f"   {row['peak_in_flight'] or 0:>2d} in flight: {rate:>5.0%} of {row['total']} account(s) "
+                  f"over {row['runs']} run(s), {row['seconds_per_account'] or 0:.1f}s per account")
+
+        run_id = run_id or self.latest_run_ids(1)[0]
+        # Default baseline: the run before the one being examined
+        baseline_id = baseline_id or self.previous_run_id(run_id)
+
+        if baseline_id:
+            comparison = self.compare_runs(run_id, baseline_id)
+            if comparison["run"] is None or comparison["baseline"] is None:
+                print(f"\n❌ Unknown run id: {run_id if comparison['run'] is None else baseline_id}")
+            else:
+                print(f"\n🔍 Run {run_id} vs baseline {baseline_id}:")
+                regressions = [s for s in comparison["steps"] if s["regressed"]]
+                for s in comparison["steps"]:
+                    if s["delta"] is None:
+                        only = "baseline" if s["current"] is None else "this run"
+                        print(f"   {s['step']:26s} {'':>8s} only in {only}")
+                        continue
+                    flag = "⚠️ " if s["regressed"] else "  "
+                    ratio = "-" if s["ratio"] is None else f"{s['ratio']:.2f}x"
+                    print(f"   {flag}{s['step']:24s} {s['baseline']:6.1f}s → {s['current']:6.1f}s "
+                          f"({s['delta']:+.1f}s, {ratio})")
+                print(f"   {len(regressions)} step(s) regressed")
+        elif self.conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone() is None:
+            print(f"\n❌ Unknown run id: {run_id}")
+        elif self.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 1:
+            print("\n🔍 Only one run recorded - no baseline to compare against")
+        else:
+            print(f"\n🔍 No run recorded before {run_id} - pass --baseline to compare against a later run")
+
+        print(f"\n🐢 Slowest accounts (last {last} runs):")
+        for row in self.slowest_accounts(last, top):
+            avg = f"{row['avg_duration']:.1f}s" if row["avg_duration"] is not None else "never succeeded"
+            print(f"   {row['account_name'] or row['username']:30s} avg {avg:>8s}  "
+                  f"{row['succeeded']}/{row['attempts']} succeeded")
+
+        print(f"\n🐢 Slowest steps (last {last} runs):")
+        for row in self.slowest_steps(last, top):
+            avg = f"{row['avg_duration']:.1f}s" if row["avg_duration"] is not None else "-"
+            max_duration = f"{row['max_duration']:.1f}s" if row["max_duration"] is not None else "-"
+            print(f"   {row['step']:26s} avg {avg:>7s}  max {max_duration:>7s}  "
+                  f"{row['failures']} failure(s) in {row['samples']}")
+
+        print(f"{'='*80}\n")
+
+
+def main():
+    """Command line entry point for the analytics report"""
+    parser = argparse.ArgumentParser(description="Compare Meroshare automation runs")
+    parser.add_argument("--db", default="logs/analytics.db", help="SQLite analytics store")
+    parser.add_argument("--metrics-dir", default="logs", help="Directory with run_metrics_*.json files")
+    parser.add_argument("--run", help="Run id to examine (default: latest)")
+    parser.add_argument("--baseline", help="Run id to compare against (default: the run before)")
+    parser.add_argument("--last", type=int, default=10, help="Number of recent runs to report on")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest accounts/steps to show")
+    args = parser.parse_args()
+
+    analytics = RunAnalytics(args.db, args.metrics_dir)
+    try:
+        analytics.print_report(args.run, args.baseline, args.last, args.top)
+    finally:
+        analytics.close()
+
+
+if __name__ == "__main__":
+    main()
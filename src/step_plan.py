@@ -0,0 +1,570 @@
+"""
+Meroshare Step Plan
+Declarative description of the IPO application flow and the single engine
+that executes it, prints it as instructions, or estimates how long it takes
+"""
+
+import re
+import string
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+MEROSHARE_URL = "https://meroshare.cdsc.com.np"
+
+ACTION_KINDS = ("navigate", "select", "fill", "click", "wait", "screenshot")
+
+# Rough portal cost (seconds) of each action on top of its fixed waits, used
+# when there is no recorded run to estimate from
+NETWORK_ESTIMATES = {
+    "navigate": 2.0,
+    "load_state": 1.5,
+    "selector": 0.5,
+    "interaction": 0.2,
+    "screenshot": 0.5,
+}
+
+
+def console(message: str) -> None:
+    """Print a progress line, tagged with the worker name when accounts run in parallel"""
+    thread = threading.current_thread()
+    if thread is threading.main_thread():
+        print(message)
+        return
+    # Keep leading blank lines before the tag so section breaks still line up
+    body = message.lstrip("\n")
+    print(f"{message[:len(message) - len(body)]}[{thread.name}] {body}")
+
+
+# ---------------------------------------------------------------------------
+# Plan building blocks
+# ---------------------------------------------------------------------------
+
+def navigate(url: str, wait_until: str = "domcontentloaded", settle: float = 0.0) -> Dict:
+    """Go to a URL"""
+    return {"kind": "navigate", "url": url, "wait_until": wait_until, "settle": settle,
+            "optional": False, "description": url}
+
+
+def wait(
+    description: str,
+    selector: Optional[str] = None,
+    state: str = "visible",
+    load_state: Optional[str] = None,
+    timeout: int = 10000,
+    settle: float = 0.0,
+    optional: bool = False,
+    error: Optional[str] = None
+) -> Dict:
+    """Wait for a selector, a page load state, or just a fixed number of seconds (settle)"""
+    return {"kind": "wait", "selectors": [selector] if selector else [], "state": state,
+            "load_state": load_state, "timeout": timeout, "settle": settle,
+            "optional": optional, "error": error, "description": description}
+
+
+def fill(
+    description: str,
+    selectors: List[str],
+    value: str,
+    nth: int = 0,
+    type_delay: float = 0.0,
+    secret: bool = False,
+    timeout: int = 5000,
+    settle: float = 0.0
+) -> Dict:
+    """Fill the first matching field (selectors are tried in order)"""
+    return {"kind": "fill", "selectors": selectors, "value": value, "nth": nth,
+            "type_delay": type_delay, "secret": secret, "timeout": timeout,
+            "settle": settle, "optional": False, "description": description}
+
+
+def click(
+    description: str,
+    selector: str,
+    check: bool = False,
+    if_empty: bool = False,
+    settle: float = 0.0,
+    optional: bool = False
+) -> Dict:
+    """Click (or check) the first element matching the selector"""
+    return {"kind": "click", "selectors": [selector], "nth": 0, "check": check,
+            "if_empty": if_empty, "settle": settle, "optional": optional,
+            "description": description}
+
+
+def select(
+    description: str,
+    selector: str,
+    strategies: List[Tuple[str, object]],
+    settle: float = 0.0,
+    optional: bool = False
+) -> Dict:
+    """Choose an option in a <select>, trying (value|label|index, option) strategies in order"""
+    return {"kind": "select", "selectors": [selector], "nth": 0, "strategies": strategies,
+            "settle": settle, "optional": optional, "description": description}
+
+
+def screenshot(name: str, debug_only: bool = False) -> Dict:
+    """Save a full page screenshot in the run's screenshot directory"""
+    return {"kind": "screenshot", "path": "{screenshot_dir}/" + name, "debug_only": debug_only,
+            "settle": 0.0, "optional": False, "description": "{screenshot_dir}/" + name}
+
+
+def stage(name: str, title: str, actions: List[Dict], pace: bool = False) -> Dict:
+    """A named, timed group of actions (pace: space it from other portal requests)"""
+    return {"name": name, "title": title, "pace": pace, "actions": actions}
+
+
+def build_apply_plan() -> List[Dict]:
+    """The IPO application flow as a list of stages (uncompiled template)"""
+    return [
+        stage("navigate", "1️⃣  Navigating to Meroshare...", [
+            navigate("{base_url}/", settle=3),
+            wait("Page fully loaded", load_state="networkidle", timeout=20000, settle=2),
+        ], pace=True),
+        stage("select_dp", "2️⃣  Selecting DP...", [
+            wait("Select2 DP dropdown", selector=".select2-selection", settle=0),
+            click("DP dropdown", ".select2-selection", settle=1),
+            fill("DP search: {dp_name}", [".select2-search__field"], "{dp_search}", settle=1.5),
+            click("First matching DP", ".select2-results__option:first-child", settle=2),
+            # The login form loads dynamically once a DP is chosen
+            wait("Login form loaded", load_state="networkidle", timeout=10000, settle=3),
+        ]),
+        stage("enter_credentials", "3️⃣  Entering credentials...", [
+            fill("Username", [
+                "input[placeholder='User Id / Username']",
+                "input[formcontrolname='username']",
+                "input#username",
+                "input[type='text']",
+            ], "{username}"),
+            fill("Password", [
+                "input[placeholder='Password']",
+                "input[formcontrolname='password']",
+                "input#password",
+                "input[type='password']",
+            ], "{password}", secret=True, settle=0.5),
+        ]),
+        stage("login", "4️⃣  Logging in...", [
+            click("Login button", "button:has-text('Login')"),
+            wait("Login completed", load_state="networkidle", timeout=15000, settle=3),
+        ], pace=True),
+        stage("open_asba", "5️⃣  Navigating to ASBA section...", [
+            navigate("{base_url}/#/asba", settle=4),
+            wait("IPO list loaded", load_state="networkidle", timeout=15000, settle=2),
+        ], pace=True),
+        stage("find_ipo", "6️⃣  Looking for IPO...", [
+            # Extra settle for Angular to render the IPO cards
+            wait("Page content", selector="body", timeout=5000, settle=5),
+            screenshot("debug_ipo_list_{username}.png"),
+            wait("Apply button for: {ipo_company}", selector="button:has-text('Apply')",
+                 timeout=5000, error="No IPOs available to apply - might be closed or already applied"),
+            click("Apply button for: {ipo_company}", "button:has-text('Apply')", settle=3),
+            screenshot("debug_after_apply_{username}.png", debug_only=True),
+        ]),
+        stage("select_bank", "7️⃣  Selecting bank...", [
+            wait("Application form", settle=3),
+            wait("Application form loaded", load_state="networkidle", timeout=10000),
+            wait("Bank dropdown", selector="select", timeout=10000, settle=1),
+            # Account dropdown and branch populate after the bank is chosen
+            select("Bank: {bank_name}", "select", [("label", "{bank_name}")], settle=3),
+        ]),
+        stage("select_account", "8️⃣  Selecting account number...", [
+            wait("Account options", settle=3),
+            wait("Account options loaded", selector="select#accountNumber option:not([value=''])",
+                 state="attached", timeout=10000, settle=1, optional=True),
+            select("Account: {account_number}", "select#accountNumber, select[name='accountNumber']", [
+                ("value", "{account_number}"),
+                ("label", "{account_number}"),
+                ("index", 1),  # First non-empty option
+            ], settle=2, optional=True),
+            wait("Branch auto-filled: {branch}", settle=1),
+        ]),
+        stage("enter_kitta", "9️⃣  Entering Applied Kitta (slowly to trigger calculation)...", [
+            fill("Applied Kitta: {kitta}",
+                 ["input[placeholder*='Applied Kitta'], input[placeholder*='Kitta Number']"],
+                 "{kitta}", type_delay=0.3, settle=1),
+        ]),
+        stage("verify_amount", "9️⃣  Verifying Amount calculation...", [
+            wait("Amount calculation", settle=1),
+            click("Amount field",
+                  "input[placeholder*='Amount'], input[formcontrolname='amount']",
+                  if_empty=True, settle=1, optional=True),
+        ]),
+        stage("enter_crn", "🔟  Entering CRN...", [
+            fill("CRN: {crn}", ["input[placeholder*='CRN']"], "{crn}", settle=0.5),
+        ]),
+        stage("accept_terms", "1️⃣1️⃣  Accepting terms...", [
+            wait("Form validation", settle=1),
+            click("Agreement checkbox", "input[type='checkbox']", check=True, settle=1, optional=True),
+        ]),
+        stage("screenshot_before_submit", "1️⃣2️⃣  Taking screenshot before submit...", [
+            screenshot("before_submit_{username}.png"),
+        ]),
+        stage("proceed", "1️⃣3️⃣  Clicking Proceed...", [
+            wait("Proceed button enabled", settle=2),
+            click("Proceed button", "button:has-text('Proceed'):not([disabled])", settle=3),
+        ]),
+        stage("enter_pin", "1️⃣2️⃣  Entering PIN...", [
+            # The PIN is the last password field on the page
+            fill("Transaction PIN", ["input[type='password']"], "{pin}", nth=-1,
+                 secret=True, timeout=10000, settle=0.5),
+            screenshot("pin_entered_{username}.png"),
+        ]),
+        stage("submit", "1️⃣3️⃣  Submitting application...", [
+            click("Apply button (final submit)", "button:has-text('Submit'), button:has-text('Apply')", settle=4),
+            screenshot("success_{username}.png"),
+        ], pace=True),
+        stage("open_report", "1️⃣4️⃣  Navigating to Application Report...", [
+            navigate("{base_url}/#/ipo/report", wait_until="networkidle", settle=3),
+            screenshot("report_{username}.png"),
+        ], pace=True),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+
+class _KeepMissing(dict):
+    """format_map helper that leaves unknown placeholders for a later pass"""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def _render(template, values: Dict):
+    if isinstance(template, str):
+        return template.format_map(_KeepMissing(values))
+    return template
+
+
+def _placeholders(template) -> List[str]:
+    if not isinstance(template, str):
+        return []
+    return [field for _, field, _, _ in string.Formatter().parse(template) if field]
+
+
+def account_context(account: Dict) -> Dict:
+    """Per-account values referenced by the plan"""
+    bank = account.get('bank_details', {})
+    dp_name = account.get('dp_name', '')
+    # DP number inside parentheses (e.g. "13800" from "LINCH STOCK MARKET LIMITED (13800)")
+    dp_match = re.search(r'\((\d+)\)', dp_name)
+    context = {
+        "username": account.get('username'),
+        "password": account.get('password'),
+        "pin": account.get('transaction_pin'),
+        "crn": account.get('crn'),
+        "dp_name": dp_name or None,
+        "dp_search": dp_match.group(1) if dp_match else (dp_name[:20] or None),
+        "bank_name": bank.get('bank_name'),
+        "account_number": bank['account_number'].split(' - ')[0].strip() if bank.get('account_number') else None,
+        "branch": bank.get('branch'),
+    }
+    return {key: value for key, value in context.items() if value not in (None, "")}
+
+
+def compile_plan(
+    ipo_company: str,
+    kitta: int,
+    base_url: str = MEROSHARE_URL,
+    screenshot_dir: str = "screenshots",
+    stages: Optional[List[Dict]] = None
+) -> Dict:
+    """Validate the plan and bind the run-level values once per run
+
+    Raises ValueError if a stage or action is malformed. Placeholders that
+    still need per-account values (other than in descriptions) are listed in
+    the compiled plan's "fields".
+    """
+    run_values = {
+        "ipo_company": ipo_company,
+        "kitta": str(kitta),
+        "base_url": base_url.rstrip('/'),
+        "screenshot_dir": screenshot_dir,
+    }
+    # Escape braces so bound values survive the per-account formatting pass
+    run_values = {key: value.replace("{", "{{").replace("}", "}}") for key, value in run_values.items()}
+
+    compiled = []
+    fields = set()
+    seen = set()
+    for stage_def in (stages if stages is not None else build_apply_plan()):
+        name = stage_def.get("name")
+        if not name or name in seen:
+            raise ValueError(f"Stage name missing or duplicated: {name!r}")
+        seen.add(name)
+        if not stage_def.get("actions"):
+            raise ValueError(f"Stage '{name}' has no actions")
+
+        actions = []
+        for action in stage_def["actions"]:
+            kind = action.get("kind")
+            if kind not in ACTION_KINDS:
+                raise ValueError(f"Stage '{name}': unknown action kind {kind!r}")
+            if kind in ("fill", "click", "select") and not action.get("selectors"):
+                raise ValueError(f"Stage '{name}': {kind} action '{action.get('description')}' has no selector")
+            if kind == "select" and not action.get("strategies"):
+                raise ValueError(f"Stage '{name}': select action '{action.get('description')}' has no strategies")
+
+            bound = dict(action)
+            # Decided on the templates, before any value is substituted
+            value_fields = set(_placeholders(action.get("value")))
+            bound["shows_value"] = bool(value_fields) and value_fields <= set(_placeholders(action.get("description")))
+            for key in ("url", "value", "path", "description", "error"):
+                bound[key] = _render(action.get(key), run_values)
+            bound["selectors"] = [_render(s, run_values) for s in action.get("selectors", [])]
+            bound["strategies"] = [(by, _render(option, run_values)) for by, option in action.get("strategies", [])]
+
+            # Only placeholders the browser actually needs are required per account
+            for key in ("url", "value", "path"):
+                fields.update(_placeholders(bound[key]))
+            for selector in bound["selectors"]:
+                fields.update(_placeholders(selector))
+            for _, option in bound["strategies"]:
+                fields.update(_placeholders(option))
+            actions.append(bound)
+
+        compiled.append({**stage_def, "actions": actions})
+
+    return {
+        "ipo_company": ipo_company,
+        "kitta": kitta,
+        "base_url": base_url.rstrip('/'),
+        "stages": compiled,
+        "fields": sorted(fields),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+class PlanEngine:
+    """Run, describe or time a compiled plan - the only place the flow is interpreted"""
+
+    def __init__(self, plan: Dict, verbose: bool = False):
+        self.plan = plan
+        self.verbose = verbose
+
+    def missing_fields(self, account: Dict) -> List[str]:
+        """Plan placeholders this account has no value for"""
+        context = account_context(account)
+        return [field for field in self.plan["fields"] if field not in context]
+
+    def _bind(self, action: Dict, context: Dict) -> Dict:
+        bound = dict(action)
+        for key in ("url", "value", "path", "description", "error"):
+            bound[key] = _render(action.get(key), context)
+        bound["selectors"] = [_render(s, context) for s in action.get("selectors", [])]
+        bound["strategies"] = [(by, _render(option, context)) for by, option in action.get("strategies", [])]
+        return bound
+
+    # -- execution ----------------------------------------------------------
+
+    def run(self, page, account: Dict, timer=None, controller=None) -> None:
+        """Execute every stage for one account on a Playwright page"""
+        missing = self.missing_fields(account)
+        if missing:
+            raise Exception(f"Account config is missing: {', '.join(missing)}")
+
+        context = account_context(account)
+        for stage_def in self.plan["stages"]:
+            if controller and stage_def["pace"]:
+                controller.pace()
+            if timer:
+                timer.start(stage_def["name"])
+            console(stage_def["title"])
+
+            for action in stage_def["actions"]:
+                bound = self._bind(action, context)
+                try:
+                    self._execute(page, bound)
+                except Exception as e:
+                    if not bound["optional"]:
+                        raise
+                    console(f"   ⚠️  {bound['description']}: {e}")
+                time.sleep(bound["settle"])
+
+        if timer:
+            timer.finish()
+
+    def _locate(self, page, action: Dict):
+        """First selector that becomes visible within the timeout"""
+        last_error = None
+        for selector in action["selectors"]:
+            try:
+                page.wait_for_selector(selector, state="visible", timeout=action.get("timeout", 5000))
+            except Exception as e:
+                last_error = e
+                continue
+            if self.verbose and len(action["selectors"]) > 1:
+                console(f"   ✅ {action['description']} found using: {selector}")
+            return page.locator(selector).nth(action.get("nth", 0))
+        raise Exception(f"Could not find {action['description']} field: {last_error}")
+
+    def _execute(self, page, action: Dict) -> None:
+        kind = action["kind"]
+
+        if kind == "navigate":
+            page.goto(action["url"], wait_until=action["wait_until"])
+            if self.verbose:
+                console(f"   🌐 Current URL: {page.url}")
+
+        elif kind == "wait":
+            try:
+                if action["selectors"]:
+                    page.wait_for_selector(action["selectors"][0], state=action["state"], timeout=action["timeout"])
+                if action["load_state"]:
+                    page.wait_for_load_state(action["load_state"], timeout=action["timeout"])
+            except Exception as e:
+                if action["error"]:
+                    raise Exception(action["error"]) from e
+                raise
+
+        elif kind == "fill":
+            field = self._locate(page, action)
+            if action["type_delay"]:
+                # Type digit by digit so the page's input handlers (e.g. amount calculation) fire
+                field.click()
+                time.sleep(0.5)
+                for char in action["value"]:
+                    page.keyboard.type(char)
+                    time.sleep(action["type_delay"])
+            else:
+                field.fill(action["value"])
+
+        elif kind == "click":
+            target = page.locator(action["selectors"][0]).nth(action["nth"])
+            if action["if_empty"] and target.input_value():
+                return
+            if action["check"]:
+                target.check()
+            else:
+                target.click()
+
+        elif kind == "select":
+            dropdown = page.locator(action["selectors"][0]).nth(action["nth"])
+            last_error = None
+            for by, option in action["strategies"]:
+                try:
+                    dropdown.select_option(**{by: option})
+                    if self.verbose:
+                        console(f"   ✅ {action['description']} (selected by {by})")
+                    return
+                except Exception as e:
+                    last_error = e
+            raise Exception(f"Could not select {action['description']}: {last_error}")
+
+        elif kind == "screenshot":
+            if action["debug_only"] and not self.verbose:
+                return
+            page.screenshot(path=action["path"], full_page=True)
+            if self.verbose:
+                console(f"   📸 Screenshot saved: {action['path']}")
+
+    # -- instructions ---------------------------------------------------------
+
+    def describe(self, account: Dict) -> List[Tuple[str, str, str]]:
+        """Numbered (step, ACTION, description) lines for manual execution"""
+        context = account_context(account)
+        lines = []
+        for stage_def in self.plan["stages"]:
+            for action in stage_def["actions"]:
+                if action["kind"] == "screenshot" and action["debug_only"]:
+                    continue
+                bound = self._bind(action, context)
+                kind = action["kind"]
+                if kind == "navigate":
+                    description = bound["url"]
+                elif kind == "wait" and not action["selectors"] and not action["load_state"]:
+                    description = f"{action['settle']:g}s - {bound['description']}"
+                elif kind == "fill":
+                    if action["secret"]:
+                        description = f"{bound['description']}: ****"
+                    elif action["shows_value"]:
+                        description = bound["description"]
+                    else:
+                        description = f"{bound['description']}: {bound['value']}"
+                elif kind == "screenshot":
+                    description = bound["path"]
+                else:
+                    description = bound["description"]
+                description += self._wait_conditions(action)
+                if kind == "click" and action["if_empty"]:
+                    description += " (only if still empty)"
+                elif kind == "wait" and action["optional"]:
+                    description += " (continue on timeout)"
+                elif action["optional"]:
+                    description += " (if present)"
+                lines.append((str(len(lines) + 1), kind.upper(), description))
+        return lines
+
+    @staticmethod
+    def _wait_conditions(action: Dict) -> str:
+        """What run() waits for around an action, e.g. ' (networkidle, up to 15s) + 3s'"""
+        kind = action["kind"]
+        conditions = []
+        if kind == "navigate":
+            conditions.append(action["wait_until"])
+        elif kind == "wait":
+            if action["selectors"]:
+                conditions.append(action["state"])
+            if action["load_state"]:
+                conditions.append(action["load_state"])
+            if conditions:
+                conditions.append(f"up to {action['timeout'] / 1000:g}s")
+        elif kind == "fill":
+            conditions.append(f"visible, up to {action['timeout'] / 1000:g}s")
+            if action["type_delay"]:
+                conditions.append(f"typed {action['type_delay']:g}s per key")
+
+        text = f" ({', '.join(conditions)})" if conditions else ""
+        # Settle-only waits already lead with their duration
+        if action["settle"] and (kind != "wait" or action["selectors"] or action["load_state"]):
+            text += f" + {action['settle']:g}s"
+        return text
+
+    # -- timing ---------------------------------------------------------------
+
+    def static_estimate(self, slow_motion_ms: int = 500) -> Dict[str, float]:
+        """Per-stage seconds from fixed waits plus nominal portal costs"""
+        slow_mo = slow_motion_ms / 1000
+        estimates = {}
+        for stage_def in self.plan["stages"]:
+            seconds = 0.0
+            for action in stage_def["actions"]:
+                seconds += action["settle"]
+                kind = action["kind"]
+                if kind == "navigate":
+                    seconds += NETWORK_ESTIMATES["navigate"] + slow_mo
+                elif kind == "wait":
+                    if action["load_state"]:
+                        seconds += NETWORK_ESTIMATES["load_state"]
+                    if action["selectors"]:
+                        seconds += NETWORK_ESTIMATES["selector"]
+                elif kind == "screenshot":
+                    seconds += 0 if action["debug_only"] else NETWORK_ESTIMATES["screenshot"]
+                else:
+                    seconds += NETWORK_ESTIMATES["interaction"] + slow_mo
+                    if kind == "fill" and action["type_delay"]:
+                        # Assume a typical few-digit value, one slow_mo per keypress
+                        seconds += 0.5 + 3 * (action["type_delay"] + slow_mo)
+            estimates[stage_def["name"]] = round(seconds, 2)
+        return estimates
+
+    def estimate(self, observed: Optional[Dict[str, float]] = None, slow_motion_ms: int = 500) -> Dict:
+        """Per-account time estimate, preferring observed stage durations from past runs"""
+        observed = observed or {}
+        static = self.static_estimate(slow_motion_ms)
+        stages = {}
+        for name, seconds in static.items():
+            if name in observed:
+                stages[name] = {"seconds": round(observed[name], 2), "source": "observed"}
+            else:
+                stages[name] = {"seconds": seconds, "source": "static"}
+        return {
+            "stages": stages,
+            "per_account": round(sum(s["seconds"] for s in stages.values()), 1),
+        }
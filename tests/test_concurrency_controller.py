@@ -0,0 +1,120 @@
+import time
+
+from concurrency_controller import AdaptiveConcurrencyController, is_overload_error
+
+
+class PlaywrightTimeoutError(Exception):
+    pass
+
+
+PlaywrightTimeoutError.__name__ = "TimeoutError"
+
+
+def make_controller(**kwargs):
+    settings = dict(max_concurrency=4, min_request_spacing=0, window_size=3)
+    settings.update(kwargs)
+    return AdaptiveConcurrencyController(**settings)
+
+
+def saturate(controller):
+    """Fill every slot so a healthy window counts as 'at limit'"""
+    while controller.in_flight < controller.current_limit:
+        controller.acquire()
+
+
+def healthy_window(controller, latency=1.0):
+    saturate(controller)
+    for _ in range(controller.window_size):
+        controller.record_step("login", latency)
+
+
+def test_additive_increase_up_to_cap():
+    controller = make_controller()
+    for expected in (2, 3, 4, 4):
+        healthy_window(controller)
+        assert controller.current_limit == expected
+
+
+def test_hold_when_limit_not_used():
+    controller = make_controller()
+    for _ in range(3):
+        controller.record_step("login", 1.0)
+    assert controller.current_limit == 1
+    assert controller.metrics()["decisions"][-1]["action"] == "hold"
+
+
+def test_overload_error_halves_limit_immediately():
+    controller = make_controller(initial_concurrency=4)
+    controller.record_step("login", 1.0)
+    controller.record_step("login", 30.0, success=False, overload=True)
+    assert controller.current_limit == 2
+    controller.record_step("login", 30.0, success=False, overload=True)
+    assert controller.current_limit == 1
+    controller.record_step("login", 30.0, success=False, overload=True)
+    assert controller.current_limit == 1
+
+
+def test_business_failures_do_not_shrink_limit():
+    controller = make_controller(initial_concurrency=4)
+    for _ in range(5):
+        controller.record_step("find_ipo", 5.0, success=False, overload=False)
+    assert controller.current_limit == 4
+    metrics = controller.metrics()
+    assert metrics["step_errors"] == 5
+    assert metrics["overload_errors"] == 0
+    assert metrics["decisions"] == []
+
+
+def test_latency_above_baseline_decreases():
+    controller = make_controller(initial_concurrency=4)
+    healthy_window(controller, latency=1.0)
+    for _ in range(3):
+        controller.record_step("login", 3.0)
+    assert controller.current_limit == 2
+    assert "latency" in controller.metrics()["decisions"][-1]["reason"]
+
+
+def test_acquire_blocks_at_limit_and_release_frees_slot():
+    controller = make_controller(initial_concurrency=1)
+    controller.acquire()
+    assert controller.in_flight == 1
+    controller.release()
+    controller.acquire()
+    assert controller.in_flight == 1
+    assert controller.peak_in_flight == 1
+
+
+def test_acquire_does_not_pace():
+    controller = make_controller(initial_concurrency=2, min_request_spacing=0.2)
+    started = time.monotonic()
+    controller.acquire()
+    controller.acquire()
+    assert time.monotonic() - started < 0.1
+
+
+def test_pace_reserves_consecutive_slots():
+    controller = make_controller(min_request_spacing=0.05)
+    started = time.monotonic()
+    for _ in range(3):
+        controller.pace()
+    # First call goes straight through, the next two wait one spacing each
+    assert time.monotonic() - started >= 0.1
+
+
+def test_is_overload_error():
+    assert is_overload_error(PlaywrightTimeoutError("Timeout 15000ms exceeded"))
+    assert is_overload_error(TimeoutError())
+    assert is_overload_error(Exception("page.goto: net::ERR_CONNECTION_RESET"))
+    assert not is_overload_error(None)
+    assert not is_overload_error(Exception("No IPOs available to apply"))
+    assert not is_overload_error(Exception("Could not select Bank: Timeout 30000ms exceeded"))
+
+
+def test_overload_error_filling_the_window_still_decreases():
+    controller = make_controller(initial_concurrency=2, window_size=6)
+    saturate(controller)
+    for _ in range(5):
+        controller.record_step("login", 1.0)
+    controller.record_step("login", 30.0, success=False, overload=True)
+    assert controller.current_limit == 1
+    assert controller.metrics()["decisions"][-1]["action"] == "decrease"
@@ -0,0 +1,26 @@
+from concurrency_controller import AdaptiveConcurrencyController
+from meroshare_automation import MeroshareAutomation
+
+
+def test_account_worker_records_accounts_that_fail_early(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    automation = MeroshareAutomation(str(tmp_path / "accounts.json"))
+    controller = AdaptiveConcurrencyController(min_request_spacing=0)
+    run = {"accounts": []}
+
+    def broken(*args, **kwargs):
+        raise KeyError("username")
+
+    monkeypatch.setattr(automation, "_apply_for_account", broken)
+    controller.acquire()
+    automation._account_worker(2, {"account_name": "Account 2"}, "Example IPO", None, 0, controller, run)
+
+    assert controller.in_flight == 0
+    assert run["accounts"] == [{
+        "account_name": "Account 2",
+        "username": None,
+        "status": "Error: 'username'",
+        "steps": [],
+        "duration": 0.0,
+    }]
+    assert "Account 2 | Example IPO | Error: 'username'" in (tmp_path / "logs" / "ipo_applications.log").read_text()
@@ -0,0 +1,140 @@
+import json
+
+import pytest
+
+from run_analytics import RunAnalytics
+
+
+def make_run(run_id, step_durations, peak=1, statuses=("Success", "Success")):
+    accounts = []
+    for idx, status in enumerate(statuses, 1):
+        accounts.append({
+            "account_name": f"Account {idx}",
+            "username": f"user{idx}",
+            "status": status,
+            "duration": 60.0 + 10 * idx,
+            "steps": [
+                {"step": step, "duration": duration, "success": True, "error": None}
+                for step, duration in step_durations.items()
+            ],
+        })
+    return {
+        "run_id": run_id,
+        "ipo_company": "Example IPO",
+        "kitta": 10,
+        "started_at": f"2026-01-01 {run_id[-6:-4]}:{run_id[-4:-2]}:{run_id[-2:]}",
+        "finished_at": None,
+        "duration": 200.0,
+        "accounts": accounts,
+        "concurrency": {
+            "max_concurrency": 3,
+            "peak_in_flight": peak,
+            "final_limit": peak,
+            "step_errors": 0,
+            "decisions": [{"timestamp": "t", "step": "login", "action": "increase",
+                           "from_limit": 1, "to_limit": 2, "reason": "healthy"}],
+        },
+    }
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    store = RunAnalytics(str(tmp_path / "analytics.db"), str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_ingest_is_idempotent(analytics):
+    run = make_run("20260101_090000", {"login": 2.0})
+    assert analytics.ingest_run(run)
+    assert not analytics.ingest_run(run)
+    assert analytics.conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0] == 2
+    assert analytics.conn.execute("SELECT COUNT(*) FROM steps").fetchone()[0] == 2
+    assert analytics.conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0] == 1
+
+
+def test_sync_imports_only_new_metrics_files(analytics, tmp_path):
+    for run_id in ("20260101_090000", "20260101_100000"):
+        with open(tmp_path / f"run_metrics_{run_id}.json", "w") as f:
+            json.dump(make_run(run_id, {"login": 2.0}), f)
+    (tmp_path / "run_metrics_20260101_110000.json").write_text("{not json")
+
+    assert analytics.sync() == 2
+    assert analytics.sync() == 0
+    assert analytics.latest_run_ids(5) == ["20260101_100000", "20260101_090000"]
+
+
+def test_compare_runs_flags_slower_step(analytics):
+    analytics.ingest_run(make_run("20260101_090000", {"login": 2.0, "submit": 3.0, "navigate": 4.0}))
+    analytics.ingest_run(make_run("20260101_100000", {"login": 5.0, "submit": 3.2, "navigate": 2.0}))
+
+    comparison = analytics.compare_runs("20260101_100000", "20260101_090000")
+    steps = {s["step"]: s for s in comparison["steps"]}
+    assert steps["login"]["regressed"]
+    assert steps["login"]["delta"] == pytest.approx(3.0)
+    # Small absolute change and a speed-up are not regressions
+    assert not steps["submit"]["regressed"]
+    assert not steps["navigate"]["regressed"]
+    assert comparison["steps"][0]["step"] == "login"
+
+
+def test_previous_run_and_success_by_concurrency(analytics):
+    analytics.ingest_run(make_run("20260101_090000", {"login": 2.0}, peak=1))
+    analytics.ingest_run(make_run("20260101_100000", {"login": 2.0}, peak=3, statuses=("Success", "Error: x")))
+
+    assert analytics.previous_run_id("20260101_100000") == "20260101_090000"
+    assert analytics.previous_run_id("20260101_090000") is None
+
+    rates = {row["peak_in_flight"]: (row["succeeded"], row["total"]) for row in analytics.success_by_concurrency()}
+    assert rates == {1: (2, 2), 3: (1, 2)}
+
+
+def test_slowest_accounts_ignore_failed_attempts(analytics):
+    analytics.ingest_run(make_run("20260101_090000", {"login": 2.0}, statuses=("Success", "Error: x")))
+    rows = analytics.slowest_accounts(runs=5, limit=5)
+    assert [row["username"] for row in rows] == ["user1", "user2"]
+    assert rows[0]["avg_duration"] == pytest.approx(70.0)
+    assert rows[1]["avg_duration"] is None
+
+
+def test_report_without_earlier_run(analytics, capsys):
+    analytics.ingest_run(make_run("20260101_090000", {"login": 2.0}))
+    analytics.ingest_run(make_run("20260101_100000", {"login": 2.5}))
+
+    analytics.print_report(run_id="20260101_090000")
+    out = capsys.readouterr().out
+    assert "No run recorded before 20260101_090000" in out
+    assert "Only one run recorded" not in out
+
+    analytics.print_report()
+    assert "Run 20260101_100000 vs baseline 20260101_090000" in capsys.readouterr().out
+
+
+def test_sync_skips_metrics_files_missing_keys(analytics, tmp_path, capsys):
+    (tmp_path / "run_metrics_20260101_080000.json").write_text(json.dumps({"accounts": []}))
+    broken_step = make_run("20260101_083000", {"login": 2.0})
+    del broken_step["accounts"][1]["steps"][0]["duration"]
+    (tmp_path / "run_metrics_20260101_083000.json").write_text(json.dumps(broken_step))
+    (tmp_path / "run_metrics_20260101_084500.json").write_text(json.dumps([1, 2]))
+    with open(tmp_path / "run_metrics_20260101_090000.json", "w") as f:
+        json.dump(make_run("20260101_090000", {"login": 2.0}), f)
+
+    assert analytics.sync() == 1
+    assert "Skipping unreadable metrics file" in capsys.readouterr().out
+    # The half-ingested run was rolled back
+    assert analytics.latest_run_ids(5) == ["20260101_090000"]
+    assert analytics.conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0] == 2
+
+
+def test_compare_runs_with_zero_second_baseline(analytics, capsys):
+    analytics.ingest_run(make_run("20260101_090000", {"screenshot": 0.0, "login": 2.0}))
+    analytics.ingest_run(make_run("20260101_100000", {"screenshot": 0.8, "login": 2.0}))
+
+    steps = {s["step"]: s for s in analytics.compare_runs("20260101_100000", "20260101_090000")["steps"]}
+    assert steps["screenshot"]["ratio"] is None
+    assert steps["screenshot"]["regressed"]
+    assert not steps["login"]["regressed"]
+
+    analytics.print_report()
+    out = capsys.readouterr().out
+    assert "screenshot" in out and "(+0.8s, -)" in out
@@ -0,0 +1,132 @@
+import pytest
+
+from step_plan import PlanEngine, click, compile_plan, fill, stage, wait
+
+
+ACCOUNT = {
+    "account_name": "Account 1",
+    "dp_name": "LINCH STOCK MARKET LIMITED (13800)",
+    "username": "name",
+    "password": "secret-password",
+    "transaction_pin": "9876",
+    "crn": "CRN123",
+    "bank_details": {
+        "bank_name": "Some Bank",
+        "account_number": "0012345 - SAVING ACCOUNT",
+        "branch": "Main Branch",
+    },
+    "enabled": True,
+}
+
+
+def describe(account=ACCOUNT, **kwargs):
+    engine = PlanEngine(compile_plan("Example IPO", 10, **kwargs))
+    return {description for _, _, description in engine.describe(account)}
+
+
+def test_compile_rejects_unknown_kind():
+    bad = [stage("broken", "Broken", [{"kind": "hover", "description": "x"}])]
+    with pytest.raises(ValueError, match="unknown action kind"):
+        compile_plan("Example IPO", 10, stages=bad)
+
+
+def test_compile_rejects_duplicate_stage_and_missing_selector():
+    action = wait("Pause", settle=1)
+    with pytest.raises(ValueError, match="duplicated"):
+        compile_plan("Example IPO", 10, stages=[stage("a", "A", [action]), stage("a", "A", [action])])
+    no_selector = fill("Username", [], "{username}")
+    with pytest.raises(ValueError, match="has no selector"):
+        compile_plan("Example IPO", 10, stages=[stage("a", "A", [no_selector])])
+
+
+def test_compile_lists_required_account_fields():
+    plan = compile_plan("Example IPO", 10)
+    assert {"username", "password", "pin", "crn", "dp_search", "bank_name", "account_number"} <= set(plan["fields"])
+    # Description-only placeholders are not required
+    assert "branch" not in plan["fields"]
+    assert "dp_name" not in plan["fields"]
+
+
+def test_missing_fields():
+    engine = PlanEngine(compile_plan("Example IPO", 10))
+    assert engine.missing_fields(ACCOUNT) == []
+    account = dict(ACCOUNT)
+    del account["crn"]
+    assert engine.missing_fields(account) == ["crn"]
+
+
+def test_braces_in_run_values_survive_account_binding():
+    engine = PlanEngine(compile_plan("{Odd} IPO {username}", 10))
+    descriptions = [description for _, _, description in engine.describe(ACCOUNT)]
+    assert "Apply button for: {Odd} IPO {username} + 3s" in descriptions
+
+
+def test_describe_shows_fill_values():
+    lines = describe()
+    # "name" is a substring of "Username" - the value must still be printed
+    assert "Username: name (visible, up to 5s)" in lines
+    assert "Applied Kitta: 10 (visible, up to 5s, typed 0.3s per key) + 1s" in lines
+    assert "CRN: CRN123 (visible, up to 5s) + 0.5s" in lines
+    assert "DP search: LINCH STOCK MARKET LIMITED (13800): 13800 (visible, up to 5s) + 1.5s" in lines
+
+
+def test_describe_masks_secrets():
+    lines = describe()
+    assert "Password: **** (visible, up to 5s) + 0.5s" in lines
+    assert "Transaction PIN: **** (visible, up to 10s) + 0.5s" in lines
+    assert not any("secret-password" in line or "9876" in line for line in lines)
+
+
+def test_describe_optional_suffixes():
+    lines = describe()
+    assert "Amount field + 1s (only if still empty)" in lines
+    assert "Account options loaded (attached, up to 10s) + 1s (continue on timeout)" in lines
+    assert "Agreement checkbox + 1s (if present)" in lines
+
+
+def test_describe_uses_base_url_and_screenshot_dir():
+    lines = describe(base_url="http://localhost:8000/", screenshot_dir="screenshots/dry_run")
+    assert "http://localhost:8000/#/asba (domcontentloaded) + 4s" in lines
+    assert "screenshots/dry_run/before_submit_name.png" in lines
+
+
+def test_estimate_prefers_observed_durations():
+    engine = PlanEngine(compile_plan("Example IPO", 10))
+    static = engine.estimate()
+    observed = engine.estimate({"login": 42.0})
+    assert observed["stages"]["login"] == {"seconds": 42.0, "source": "observed"}
+    assert observed["stages"]["navigate"]["source"] == "static"
+    assert observed["per_account"] > static["per_account"]
+
+
+def test_estimate_counts_fixed_waits():
+    plan = compile_plan("Example IPO", 10, stages=[stage("pause", "Pause", [wait("Pause", settle=2.5)])])
+    assert PlanEngine(plan).static_estimate()["pause"] == 2.5
+
+
+def test_click_without_if_empty_has_no_empty_suffix():
+    plan = compile_plan("Example IPO", 10, stages=[stage("go", "Go", [click("Login button", "button")])])
+    assert PlanEngine(plan).describe(ACCOUNT) == [("1", "CLICK", "Login button")]
+
+
+def test_describe_renders_wait_conditions():
+    lines = describe()
+    assert "Login completed (networkidle, up to 15s) + 3s" in lines
+    assert "Bank dropdown (visible, up to 10s) + 1s" in lines
+    assert "3s - Application form" in lines
+    assert "Apply button (final submit) + 4s" in lines
+    assert "https://meroshare.cdsc.com.np/#/ipo/report (networkidle) + 3s" in lines
+
+
+def test_describe_waits_match_static_estimate():
+    plan = compile_plan("Example IPO", 10, stages=[stage("login", "Login", [
+        click("Login button", "button", settle=0.5),
+        wait("Login completed", load_state="networkidle", timeout=15000, settle=3),
+    ])])
+    engine = PlanEngine(plan)
+    assert [d for _, _, d in engine.describe(ACCOUNT)] == [
+        "Login button + 0.5s",
+        "Login completed (networkidle, up to 15s) + 3s",
+    ]
+    # Both settles are part of the estimate, on top of nominal portal time
+    assert engine.static_estimate(slow_motion_ms=0)["login"] == pytest.approx(0.5 + 3 + 0.2 + 1.5)